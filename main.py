@@ -1,128 +1,344 @@
+from bisect import bisect_left, insort
+from calendar import isleap
 from collections import UserDict
 from datetime import datetime, date, timedelta
 from abc import ABC, abstractmethod
+import atexit
+import os
 import pickle
-
-def save_data(book, filename='addressbook.pkl'):
-    with open(filename, 'wb') as f:
-        pickle.dump(book, f)
+import pickletools
+import re
+import struct
+import sys
+
+try:
+    from _pickle import dumps as _pdumps, loads as _ploads, load as _pload
+except ImportError:
+    from pickle import dumps as _pdumps, loads as _ploads, load as _pload
+
+# Days to move a congratulation forward so it never falls on a weekend.
+_SHIFT = (0, 0, 0, 0, 0, 2, 1)
+_PHONE_RE = re.compile(r"\A\d{10}\Z")
+
+def save_data(book, filename='addressbook.pkl', optimize=False):
+    buf = _pdumps(book, protocol=pickle.HIGHEST_PROTOCOL)
+    if optimize:
+        buf = pickletools.optimize(buf)
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(buf)
+    if os.path.exists(filename):
+        os.replace(filename, filename + '.bak')
+    os.replace(tmp, filename)
+    book._dirty = False
 
 def load_data(filename='addressbook.pkl'):
-    try:
-        with open(filename, 'rb') as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        return AddressBook()
+    # Fall back to the previous snapshot if the current one is missing or torn.
+    for path in (filename, filename + '.bak'):
+        try:
+            with open(path, 'rb') as f:
+                return _pload(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            continue
+    return AddressBook()
+
+def _next_birthday(month, day, today):
+    for year in (today.year, today.year + 1):
+        try:
+            birthday = date(year, month, day)
+        except ValueError:
+            # 29 February outside a leap year.
+            birthday = date(year, 3, 1)
+        if birthday >= today:
+            return birthday
+
+def _restore_slots(obj, state):
+    # Books pickled before __slots__ was introduced carry a plain __dict__.
+    if isinstance(state, tuple):
+        state = state[1]
+    for key, value in state.items():
+        setattr(obj, key, value)
 
 class Field:
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
     def __str__(self):
         return str(self.value)
+    def __setstate__(self, state):
+        _restore_slots(self, state)
 
 class Name(Field):
-    pass
+    __slots__ = ()
+
+    def __init__(self, value):
+        # The book keys records by name, so key and field share one string.
+        super().__init__(sys.intern(value))
+
+def validate_phone(value):
+    if not _PHONE_RE.match(value):
+        raise ValueError("Phone number must be exactly 10 digits.")
+    return value
 
 class Phone(Field):
+    # Records store phones as plain strings; the class is kept so that
+    # books pickled with Phone objects still load.
+    __slots__ = ()
+
     def __init__(self, value):
-        if not value.isdigit() or len(value) != 10:
-            raise ValueError("Phone number must be exactly 10 digits.")
-        super().__init__(value)
+        super().__init__(validate_phone(value))
 
 class Birthday(Field):
+    __slots__ = ('date',)
+
     def __init__(self, value):
         try:
-            datetime.strptime(value, "%d.%m.%Y")
+            parsed = datetime.strptime(value, "%d.%m.%Y").date()
         except ValueError:
             raise ValueError("Invalid date format. Use DD.MM.YYYY")
         super().__init__(value)
+        self.date = parsed
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        if not hasattr(self, 'date'):
+            self.date = datetime.strptime(self.value, "%d.%m.%Y").date()
 
 class Record:
+    __slots__ = ('name', 'phones', 'birthday')
+
     def __init__(self, name):
         self.name = Name(name)
-        self.phones = []
+        self.phones = {}
         self.birthday = None
 
+    def __setstate__(self, state):
+        _restore_slots(self, state)
+        if isinstance(self.phones, list):
+            self.phones = dict.fromkeys(p.value for p in self.phones)
+
     def __str__(self):
-        phones_str = ";".join(p.value for p in self.phones) if self.phones else ""
-        birthday_str = f", birthday: {self.birthday.value}" if self.birthday else ""
-        return f"Contact name: {self.name.value}, phones: {phones_str}{birthday_str}"
+        phones_str = ";".join(self.phones)
+        if self.birthday:
+            return f"Contact name: {self.name.value}, phones: {phones_str}, birthday: {self.birthday.value}"
+        return f"Contact name: {self.name.value}, phones: {phones_str}"
 
     def add_phone(self, phone):
-        new_phone = Phone(phone)
-        self.phones.append(new_phone)
+        validate_phone(phone)
+        if phone in self.phones:
+            raise ValueError("Phone number already exists.")
+        self.phones[phone] = None
 
     def remove_phone(self, phone: str):
-        phone_obj = self.find_phone(phone)
-        if phone_obj:
-            self.phones.remove(phone_obj)
-        else:
+        if phone not in self.phones:
             raise ValueError("Phone number not found.")
+        del self.phones[phone]
 
     def edit_phone(self, old_phone: str, new_phone: str):
-        if not self.find_phone(old_phone):
+        if old_phone not in self.phones:
             raise ValueError("Old phone number not found.")
         self.add_phone(new_phone)
-        self.remove_phone(old_phone)
+        del self.phones[old_phone]
 
     def find_phone(self, phone: str):
-        for p in self.phones:
-            if p.value == phone:
-                return p
-        return None
+        return phone if phone in self.phones else None
 
     def add_birthday(self, date_str: str):
+        """Set the birthday of a record that is not yet in an AddressBook.
+
+        For stored records use AddressBook.add_birthday, which also keeps
+        the book's birthday index in sync.
+        """
         self.birthday = Birthday(date_str)
 
 class AddressBook(UserDict):
+    _dirty = False
+    # (month, day, name) triples sorted by date; built on first use.
+    _birthday_index = None
+    # Sequence number of the last journaled mutation this book contains.
+    _journal_seq = 0
+
+    def __getstate__(self):
+        # The dirty flag and the birthday index are session state; the index
+        # is rebuilt from the records on first use after loading.
+        state = self.__dict__.copy()
+        state.pop('_dirty', None)
+        state.pop('_birthday_index', None)
+        return state
+
     def add_record(self, record: Record):
+        old = self.data.get(record.name.value)
+        if old is not None:
+            self._unindex_birthday(old)
         self.data[record.name.value] = record
+        self._index_birthday(record)
 
     def find(self, name: str):
         return self.data.get(name, None)
 
     def delete(self, name: str):
         if name in self.data:
+            self._unindex_birthday(self.data[name])
             del self.data[name]
         else:
             raise KeyError("Contact not found.")
 
+    def add_birthday(self, record: Record, date_str: str):
+        self._unindex_birthday(record)
+        try:
+            record.add_birthday(date_str)
+        finally:
+            self._index_birthday(record)
+
+    def _birthdays(self):
+        if self._birthday_index is None:
+            self._birthday_index = sorted(
+                (r.birthday.date.month, r.birthday.date.day, r.name.value)
+                for r in self.data.values()
+                if r.birthday
+            )
+        return self._birthday_index
+
+    def _index_birthday(self, record: Record):
+        if self._birthday_index is not None and record.birthday:
+            born = record.birthday.date
+            insort(self._birthday_index, (born.month, born.day, record.name.value))
+
+    def _unindex_birthday(self, record: Record):
+        if self._birthday_index is not None and record.birthday:
+            born = record.birthday.date
+            entry = (born.month, born.day, record.name.value)
+            pos = bisect_left(self._birthday_index, entry)
+            if pos < len(self._birthday_index) and self._birthday_index[pos] == entry:
+                del self._birthday_index[pos]
+
     def get_upcoming_birthdays(self, days: int = 7):
+        index = self._birthdays()
         today = date.today()
-        window = days - 1
+        start = (today.month, today.day)
+        if start == (3, 1) and not isleap(today.year):
+            # 29 February birthdays are celebrated today.
+            start = (2, 29)
+        end = today + timedelta(days=days - 1)
         items = []
 
-        for record in self.data.values():
-            if not record.birthday:
-                continue
-            born = datetime.strptime(record.birthday.value, "%d.%m.%Y").date()
-            this_year_bd = born.replace(year=today.year)
-            if this_year_bd < today:
-                this_year_bd = born.replace(year=today.year + 1)
-
-            delta = (this_year_bd - today).days
-            if 0 <= delta <= window:
-                congr_date = this_year_bd
-                if congr_date.weekday() >= 5:
-                    shift = 7 - congr_date.weekday()
-                    congr_date = congr_date + timedelta(days=shift)
-
-                items.append(
-                    (
-                        congr_date,
-                        {
-                            "name": record.name.value,
-                            "birthday": congr_date.strftime("%d.%m.%Y"),
-                        },
-                    )
-                )
-
-        items.sort(key=lambda t: t[0])
-        return [d for _, d in items]
+        # Walk the index from today's date, wrapping into next year, and stop
+        # at the first birthday past the window.
+        pos = bisect_left(index, start)
+        for i in range(len(index)):
+            month, day, name = index[(pos + i) % len(index)]
+            congr_date = _next_birthday(month, day, today)
+            if congr_date > end:
+                break
+            shift = _SHIFT[congr_date.weekday()]
+            if shift:
+                congr_date += timedelta(days=shift)
+
+            items.append(
+                {
+                    "name": name,
+                    "birthday": f"{congr_date.day:02d}.{congr_date.month:02d}.{congr_date.year}",
+                }
+            )
+
+        return items
 
     def __str__(self):
         return "\n".join(str(record) for record in self.data.values())
 
+class Journal:
+    """Append-only log of mutations made since the last snapshot."""
+
+    # Operation name -> number of string arguments in its payload.
+    OPS = {"add_phone": 2, "edit_phone": 3, "add_birthday": 2}
+
+    def __init__(self, filename='addressbook.log'):
+        self.filename = filename
+
+    def append(self, book: AddressBook, op: str, payload: tuple):
+        book._journal_seq += 1
+        buf = _pdumps((book._journal_seq, op, payload), protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self.filename, 'ab') as f:
+            f.write(struct.pack(">I", len(buf)) + buf)
+
+    def replay(self, book: AddressBook):
+        try:
+            f = open(self.filename, 'rb')
+        except FileNotFoundError:
+            return 0
+        count = 0
+        with f:
+            end = os.fstat(f.fileno()).st_size
+            while True:
+                header = f.read(4)
+                if len(header) < 4:
+                    break
+                (size,) = struct.unpack(">I", header)
+                if f.tell() + size > end:
+                    # Torn tail from an interrupted append.
+                    break
+                try:
+                    entry = _ploads(f.read(size))
+                except Exception:
+                    # Corrupt record; nothing after it can be trusted.
+                    break
+                if not self._well_formed(entry):
+                    # Not written by this version; stop as for a corrupt record.
+                    break
+                seq, op, payload = entry
+                if seq <= book._journal_seq:
+                    # Already part of the snapshot.
+                    continue
+                if seq != book._journal_seq + 1:
+                    # The journal continues a newer snapshot than the one
+                    # loaded (e.g. after falling back to the backup).
+                    break
+                try:
+                    self._apply(book, op, payload)
+                except ValueError:
+                    break
+                book._journal_seq = seq
+                count += 1
+        return count
+
+    def clear(self):
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def _well_formed(cls, entry):
+        if not isinstance(entry, tuple) or len(entry) != 3:
+            return False
+        seq, op, payload = entry
+        return (
+            type(seq) is int
+            and isinstance(op, str)
+            and isinstance(payload, tuple)
+            and cls.OPS.get(op) == len(payload)
+            and all(isinstance(arg, str) for arg in payload)
+        )
+
+    @staticmethod
+    def _apply(book: AddressBook, op: str, payload: tuple):
+        name = payload[0]
+        record = book.find(name)
+        if op == "add_phone":
+            if record is None:
+                record = Record(name)
+                book.add_record(record)
+            record.add_phone(payload[1])
+        elif record is None:
+            raise ValueError("Contact not found.")
+        elif op == "edit_phone":
+            record.edit_phone(payload[1], payload[2])
+        else:
+            book.add_birthday(record, payload[1])
+
+journal = Journal()
+
 class UserView(ABC):
     @abstractmethod
     def render_welcome(self): ...
@@ -159,34 +375,36 @@ class ConsoleView(UserView):
         print(f"Error: {text}")
 
     def render_contact(self, record: Record):
-        name = record.name.value
-        phones = ";".join(p.value for p in record.phones) if record.phones else "—"
+        phones = ";".join(record.phones) or "—"
         bd = record.birthday.value if record.birthday else "—"
-        print("Contact")
-        print(f"- name: {name}")
-        print(f"- phones: {phones}")
-        print(f"- birthday: {bd}")
+        print(f"Contact\n- name: {record.name.value}\n- phones: {phones}\n- birthday: {bd}")
 
     def render_contacts(self, records):
         if not records:
             print("No contacts found.")
             return
+        lines = []
         for i, rec in enumerate(records, start=1):
             name = rec.name.value
-            phones = ";".join(p.value for p in rec.phones) if rec.phones else "—"
+            phones = ";".join(rec.phones) or "—"
             bd = rec.birthday.value if rec.birthday else "—"
-            print(f"{i}) {name} — {phones} — {bd}")
+            lines.append(f"{i}) {name} — {phones} — {bd}")
+        print("\n".join(lines))
 
     def render_help(self, commands: dict):
-        print("Available commands:")
-        width = max(len(cmd) for cmd in commands.keys())
+        lines = ["Available commands:"]
+        if commands is _HELP_COMMANDS:
+            width = _HELP_WIDTH
+        else:
+            width = max(len(cmd) for cmd in commands.keys())
         for cmd, info in commands.items():
             desc = info.get("desc", "")
             ex = info.get("example", "")
             line = f"- {cmd.ljust(width)} — {desc}"
             if ex:
                 line += f" | e.g. {ex}"
-            print(line)
+            lines.append(line)
+        print("\n".join(lines))
 
     def render_upcoming_birthdays(self, items):
         if not items:
@@ -195,9 +413,10 @@ class ConsoleView(UserView):
         groups = {}
         for it in items:
             groups.setdefault(it["birthday"], []).append(it["name"])
-        print("Upcoming birthdays (next 7 days):")
-        for d in sorted(groups.keys(), key=lambda k: datetime.strptime(k, "%d.%m.%Y")):
-            print(f"{d}: {', '.join(groups[d])}")
+        lines = ["Upcoming birthdays (next 7 days):"]
+        for d, names in groups.items():
+            lines.append(f"{d}: {', '.join(names)}")
+        print("\n".join(lines))
 
     def render_goodbye(self):
         print("Good bye!")
@@ -213,16 +432,6 @@ def input_error(func):
         except ValueError as e:
             msg = str(e) if str(e) else "Value error."
             return ("ERROR", msg)
-        except KeyError as e:
-            msg = str(e) if str(e) else "Enter user name."
-            return ("ERROR", msg)
-        except IndexError:
-            return ("ERROR", "Not enough arguments.")
-        except AttributeError:
-            return ("ERROR", "Contact not found")
-        except TypeError as e:
-            msg = str(e) if str(e) else "Type error"
-            return ("ERROR", msg)
     return inner
 
 def parse_input(user_input):
@@ -234,7 +443,10 @@ def parse_input(user_input):
 
 @input_error
 def add_contact(args, book: AddressBook):
-    name, phone, *_ = args
+    if len(args) < 2:
+        return ("ERROR", "Not enough arguments.")
+    name, phone = args[0], args[1]
+    validate_phone(phone)
     record = book.find(name)
     if record is None:
         record = Record(name)
@@ -243,28 +455,32 @@ def add_contact(args, book: AddressBook):
     else:
         message = "Contact updated."
     record.add_phone(phone)
-    save_data(book)
+    journal.append(book, "add_phone", (name, phone))
+    book._dirty = True
     return ("OK", message)
 
 @input_error
 def change_contact(args, book: AddressBook):
-    name, old_phone, new_phone, *_ = args
+    if len(args) < 3:
+        return ("ERROR", "Not enough arguments.")
+    name, old_phone, new_phone = args[0], args[1], args[2]
     record = book.find(name)
     if record is None:
-        raise ValueError("Contact not found.")
+        return ("ERROR", "Contact not found.")
     record.edit_phone(old_phone, new_phone)
-    save_data(book)
+    journal.append(book, "edit_phone", (name, old_phone, new_phone))
+    book._dirty = True
     return ("OK", "Contact updated.")
 
-@input_error
 def show_phone(args, book: AddressBook):
-    name, *_ = args
-    record = book.find(name)
+    if not args:
+        return ("ERROR", "Enter user name.")
+    record = book.find(args[0])
     if record is None:
-        raise ValueError("Contact not found.")
+        return ("ERROR", "Contact not found.")
     if not record.phones:
         return ("OK", "No phones for this contact.")
-    return ("OK", ";".join(p.value for p in record.phones))
+    return ("OK", ";".join(record.phones))
 
 def show_all(book: AddressBook):
     if not book.data:
@@ -273,20 +489,23 @@ def show_all(book: AddressBook):
 
 @input_error
 def add_birthday(args, book: AddressBook):
-    name, date_str, *_ = args
+    if len(args) < 2:
+        return ("ERROR", "Not enough arguments.")
+    name, date_str = args[0], args[1]
     record = book.find(name)
     if record is None:
-        raise ValueError("Contact not found")
-    record.add_birthday(date_str)
-    save_data(book)
+        return ("ERROR", "Contact not found")
+    book.add_birthday(record, date_str)
+    journal.append(book, "add_birthday", (name, date_str))
+    book._dirty = True
     return ("OK", "Birthday added.")
 
-@input_error
 def show_birthday(args, book: AddressBook):
-    name, *_ = args
-    record = book.find(name)
+    if not args:
+        return ("ERROR", "Enter user name.")
+    record = book.find(args[0])
     if record is None:
-        raise ValueError("Contact not found")
+        return ("ERROR", "Contact not found")
     if not record.birthday:
         return ("OK", "No birthday set.")
     return ("OK", record.birthday.value)
@@ -296,37 +515,88 @@ def birthdays(_, book: AddressBook):
     items = book.get_upcoming_birthdays()
     return ("UPCOMING_BIRTHDAYS", items)
 
+_HELP_COMMANDS = {
+    "hello": {"desc": "Greet the assistant"},
+    "add <name> <phone>": {
+        "desc": "Add phone to contact (create if not exists)",
+        "example": "add Alice 0501234567",
+    },
+    "change <name> <old> <new>": {
+        "desc": "Replace a phone number",
+        "example": "change Alice 0501234567 0937654321",
+    },
+    "phone <name>": {
+        "desc": "Show all phones for a contact",
+        "example": "phone Alice",
+    },
+    "all": {"desc": "Show all contacts"},
+    "add-birthday <name> <DD.MM.YYYY>": {
+        "desc": "Set birthday for a contact",
+        "example": "add-birthday Alice 14.03.1990",
+    },
+    "show-birthday <name>": {
+        "desc": "Show contact's birthday",
+        "example": "show-birthday Alice",
+    },
+    "birthdays": {"desc": "Upcoming birthdays for the next 7 days"},
+    "help": {"desc": "Show this help"},
+    "close | exit": {"desc": "Exit the program"},
+}
+_HELP_WIDTH = max(len(cmd) for cmd in _HELP_COMMANDS)
+
 def help_info():
-    return ("HELP", {
-        "hello": {"desc": "Greet the assistant"},
-        "add <name> <phone>": {
-            "desc": "Add phone to contact (create if not exists)",
-            "example": "add Alice 0501234567",
-        },
-        "change <name> <old> <new>": {
-            "desc": "Replace a phone number",
-            "example": "change Alice 0501234567 0937654321",
-        },
-        "phone <name>": {
-            "desc": "Show all phones for a contact",
-            "example": "phone Alice",
-        },
-        "all": {"desc": "Show all contacts"},
-        "add-birthday <name> <DD.MM.YYYY>": {
-            "desc": "Set birthday for a contact",
-            "example": "add-birthday Alice 14.03.1990",
-        },
-        "show-birthday <name>": {
-            "desc": "Show contact's birthday",
-            "example": "show-birthday Alice",
-        },
-        "birthdays": {"desc": "Upcoming birthdays for the next 7 days"},
-        "help": {"desc": "Show this help"},
-        "close | exit": {"desc": "Exit the program"},
-    })
+    return ("HELP", _HELP_COMMANDS)
+
+def handle_hello(args, book: AddressBook, view: UserView):
+    view.render_message("How can I help you?")
+
+def handle_help(args, book: AddressBook, view: UserView):
+    tag, payload = help_info()
+    view.render_help(payload)
+
+def handle_all(args, book: AddressBook, view: UserView):
+    tag, payload = show_all(book)
+    if tag == "MANY_CONTACTS":
+        view.render_contacts(payload)
+    elif tag == "OK":
+        view.render_message(payload)
+    else:
+        view.render_error(payload)
+
+def handle_birthdays(args, book: AddressBook, view: UserView):
+    tag, payload = birthdays(args, book)
+    view.render_upcoming_birthdays(payload) if tag == "UPCOMING_BIRTHDAYS" else view.render_error(payload)
+
+def message_handler(func):
+    def handler(args, book: AddressBook, view: UserView):
+        tag, payload = func(args, book)
+        view.render_message(payload) if tag == "OK" else view.render_error(payload)
+    return handler
+
+COMMANDS = {
+    "hello": handle_hello,
+    "help": handle_help,
+    "add": message_handler(add_contact),
+    "change": message_handler(change_contact),
+    "phone": message_handler(show_phone),
+    "all": handle_all,
+    "add-birthday": message_handler(add_birthday),
+    "show-birthday": message_handler(show_birthday),
+    "birthdays": handle_birthdays,
+}
+
+def compact_data(book: AddressBook):
+    save_data(book, optimize=True)
+    journal.clear()
 
 def main():
     book = load_data()
+    journal.replay(book)
+    if os.path.exists(journal.filename):
+        # Recovering from an unclean exit: fold the journal into a fresh
+        # snapshot so this session appends to an empty log.
+        compact_data(book)
+    atexit.register(lambda: book._dirty and compact_data(book))
     view = ConsoleView()
     view.render_welcome()
 
@@ -336,54 +606,18 @@ def main():
 
         if command in ["close", "exit"]:
             view.render_goodbye()
-            save_data(book)
+            if book._dirty:
+                compact_data(book)
             break
 
-        elif command == "hello":
-            view.render_message("How can I help you?")
-
-        elif command == "help":
-            tag, payload = help_info()
-            view.render_help(payload)
-
-        elif command == "add":
-            tag, payload = add_contact(args, book)
-            view.render_message(payload) if tag == "OK" else view.render_error(payload)
-
-        elif command == "change":
-            tag, payload = change_contact(args, book)
-            view.render_message(payload) if tag == "OK" else view.render_error(payload)
-
-        elif command == "phone":
-            tag, payload = show_phone(args, book)
-            view.render_message(payload) if tag == "OK" else view.render_error(payload)
-
-        elif command == "all":
-            tag, payload = show_all(book)
-            if tag == "MANY_CONTACTS":
-                view.render_contacts(payload)
-            elif tag == "OK":
-                view.render_message(payload)
-            else:
-                view.render_error(payload)
-
-        elif command == "add-birthday":
-            tag, payload = add_birthday(args, book)
-            view.render_message(payload) if tag == "OK" else view.render_error(payload)
-
-        elif command == "show-birthday":
-            tag, payload = show_birthday(args, book)
-            view.render_message(payload) if tag == "OK" else view.render_error(payload)
-
-        elif command == "birthdays":
-            tag, payload = birthdays(args, book)
-            view.render_upcoming_birthdays(payload) if tag == "UPCOMING_BIRTHDAYS" else view.render_error(payload)
-
-        elif command == "":
+        if command == "":
             continue
 
-        else:
+        handler = COMMANDS.get(command)
+        if handler is None:
             view.render_error("Invalid command.")
+        else:
+            handler(args, book, view)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,334 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+import main
+
+LEGACY_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'addressbook.pkl')
+
+
+class _MainUnpickler(pickle.Unpickler):
+    # The committed book was pickled while running main.py as a script.
+    def find_class(self, module, name):
+        if module == '__main__':
+            module = 'main'
+        return super().find_class(module, name)
+
+
+class PickleRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'addressbook.pkl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_legacy_book_loads(self):
+        with open(LEGACY_BOOK, 'rb') as f:
+            book = _MainUnpickler(f).load()
+        record = book.find('John')
+        self.assertEqual(record.name.value, 'John')
+        self.assertEqual(record.phones, {'0123456789': None})
+        self.assertIsNone(record.birthday)
+
+        main.save_data(book, self.filename, optimize=True)
+        self.assertEqual(str(main.load_data(self.filename)), str(book))
+
+    def test_slotted_book_round_trips(self):
+        book = main.AddressBook()
+        record = main.Record('Alice')
+        record.add_phone('0501234567')
+        record.add_phone('0937654321')
+        book.add_record(record)
+        book.add_birthday(record, '14.03.1990')
+        book.add_record(main.Record('Bob'))
+
+        main.save_data(book, self.filename, optimize=True)
+        loaded = main.load_data(self.filename)
+
+        self.assertEqual(str(loaded), str(book))
+        alice = loaded.find('Alice')
+        self.assertEqual(list(alice.phones), ['0501234567', '0937654321'])
+        self.assertEqual(alice.birthday.date, record.birthday.date)
+        self.assertFalse(hasattr(alice, '__dict__'))
+
+    def make_book(self, *names):
+        book = main.AddressBook()
+        for name in names:
+            book.add_record(main.Record(name))
+        return book
+
+    def test_save_keeps_previous_snapshot_as_backup(self):
+        main.save_data(self.make_book('A'), self.filename)
+        self.assertFalse(os.path.exists(self.filename + '.bak'))
+        main.save_data(self.make_book('A', 'B'), self.filename)
+
+        self.assertEqual(list(main.load_data(self.filename + '.bak').data), ['A'])
+        self.assertEqual(list(main.load_data(self.filename).data), ['A', 'B'])
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+    def test_truncated_snapshot_falls_back_to_backup(self):
+        main.save_data(self.make_book('A'), self.filename)
+        main.save_data(self.make_book('A', 'B'), self.filename)
+        with open(self.filename, 'r+b') as f:
+            f.truncate(os.path.getsize(self.filename) // 2)
+
+        self.assertEqual(list(main.load_data(self.filename).data), ['A'])
+
+    def test_missing_snapshot_falls_back_to_backup(self):
+        main.save_data(self.make_book('A'), self.filename)
+        main.save_data(self.make_book('A', 'B'), self.filename)
+        os.remove(self.filename)
+
+        self.assertEqual(list(main.load_data(self.filename).data), ['A'])
+
+    def test_no_snapshot_gives_empty_book(self):
+        book = main.load_data(self.filename)
+        self.assertIsInstance(book, main.AddressBook)
+        self.assertEqual(len(book), 0)
+
+    def test_legacy_birthday_rebuilds_date(self):
+        birthday = main.Birthday.__new__(main.Birthday)
+        birthday.__setstate__({'value': '29.02.2000'})
+        self.assertEqual(birthday.date.isoformat(), '2000-02-29')
+
+
+def _today(value):
+    class FakeDate(date):
+        @classmethod
+        def today(cls):
+            return value
+    return mock.patch.object(main, 'date', FakeDate)
+
+
+class UpcomingBirthdaysTest(unittest.TestCase):
+    def make_book(self, **birthdays):
+        book = main.AddressBook()
+        for name, date_str in birthdays.items():
+            record = main.Record(name)
+            book.add_record(record)
+            book.add_birthday(record, date_str)
+        return book
+
+    def test_weekend_birthdays_move_to_monday(self):
+        # 17.10.2026 is a Saturday, 18.10.2026 a Sunday.
+        book = self.make_book(Sat='17.10.1990', Sun='18.10.1985', Fri='16.10.2000')
+        with _today(date(2026, 10, 15)):
+            items = book.get_upcoming_birthdays()
+        self.assertEqual(items, [
+            {'name': 'Fri', 'birthday': '16.10.2026'},
+            {'name': 'Sat', 'birthday': '19.10.2026'},
+            {'name': 'Sun', 'birthday': '19.10.2026'},
+        ])
+
+    def test_window_wraps_into_next_year(self):
+        book = self.make_book(Eve='30.12.1990', New='02.01.1990', Late='10.01.1990')
+        with _today(date(2026, 12, 29)):
+            items = book.get_upcoming_birthdays()
+        self.assertEqual([it['name'] for it in items], ['Eve', 'New'])
+
+    def test_index_is_not_pickled(self):
+        book = self.make_book(Ann='20.10.1990')
+        with _today(date(2026, 10, 15)):
+            book.get_upcoming_birthdays()
+        self.assertIsNotNone(book._birthday_index)
+
+        buf = pickle.dumps(book, protocol=pickle.HIGHEST_PROTOCOL)
+        self.assertNotIn(b'_birthday_index', buf)
+        loaded = pickle.loads(buf)
+        loaded.add_birthday(loaded.find('Ann'), '21.10.1990')
+        with _today(date(2026, 10, 15)):
+            self.assertEqual(
+                loaded.get_upcoming_birthdays(),
+                [{'name': 'Ann', 'birthday': '21.10.2026'}],
+            )
+
+    def test_index_follows_updates(self):
+        book = self.make_book(Ann='20.10.1990', Bob='01.01.1990')
+        with _today(date(2026, 10, 15)):
+            book.get_upcoming_birthdays()
+            book.add_birthday(book.find('Bob'), '16.10.1990')
+            book.delete('Ann')
+            record = main.Record('Cid')
+            record.add_birthday('17.10.1990')
+            book.add_record(record)
+            with self.assertRaises(ValueError):
+                book.add_birthday(book.find('Bob'), '31.02.1990')
+            self.assertEqual(
+                [it['name'] for it in book.get_upcoming_birthdays()],
+                ['Bob', 'Cid'],
+            )
+
+    def test_leap_day_in_non_leap_year(self):
+        book = self.make_book(Leap='29.02.2000')
+        for today, expected in [
+            (date(2027, 2, 25), '01.03.2027'),
+            (date(2027, 3, 1), '01.03.2027'),
+            (date(2028, 2, 25), '29.02.2028'),
+        ]:
+            with self.subTest(today=today), _today(today):
+                self.assertEqual(
+                    book.get_upcoming_birthdays(),
+                    [{'name': 'Leap', 'birthday': expected}],
+                )
+        with _today(date(2027, 3, 2)):
+            self.assertEqual(book.get_upcoming_birthdays(), [])
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.tmp.name, 'addressbook.pkl')
+        self.journal = main.Journal(os.path.join(self.tmp.name, 'addressbook.log'))
+        patcher = mock.patch.object(main, 'journal', self.journal)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_replay_restores_unsaved_mutations(self):
+        book = main.AddressBook()
+        main.add_contact(['A', '0000000001'], book)
+        main.save_data(book, self.snapshot)
+        self.journal.clear()
+        main.add_contact(['A', '0000000003'], book)
+        main.change_contact(['A', '0000000001', '0000000002'], book)
+        main.add_birthday(['A', '14.03.1990'], book)
+
+        loaded = main.load_data(self.snapshot)
+        self.assertEqual(self.journal.replay(loaded), 3)
+        self.assertEqual(str(loaded), str(book))
+
+    def test_replay_skips_mutations_already_in_snapshot(self):
+        book = main.AddressBook()
+        main.add_contact(['A', '0000000001'], book)
+        main.change_contact(['A', '0000000001', '0000000002'], book)
+        # Crash between writing the snapshot and clearing the journal.
+        main.save_data(book, self.snapshot)
+
+        loaded = main.load_data(self.snapshot)
+        self.assertEqual(self.journal.replay(loaded), 0)
+        self.assertEqual(list(loaded.find('A').phones), ['0000000002'])
+
+        main.add_contact(['A', '0000000004'], loaded)
+        reloaded = main.load_data(self.snapshot)
+        self.assertEqual(self.journal.replay(reloaded), 1)
+        self.assertEqual(str(reloaded), str(loaded))
+
+    def test_torn_tail_is_ignored(self):
+        book = main.AddressBook()
+        main.add_contact(['A', '0000000001'], book)
+        main.add_contact(['B', '0000000002'], book)
+        with open(self.journal.filename, 'r+b') as f:
+            f.truncate(os.path.getsize(self.journal.filename) - 3)
+
+        loaded = main.AddressBook()
+        self.assertEqual(self.journal.replay(loaded), 1)
+        self.assertEqual(list(loaded.data), ['A'])
+
+    def test_replay_stops_at_corrupt_record(self):
+        book = main.AddressBook()
+        main.add_contact(['A', '0000000001'], book)
+        with open(self.journal.filename, 'ab') as f:
+            f.write(main.struct.pack(">I", 3) + b'\x00\x01\x02')
+        main.add_contact(['B', '0000000002'], book)
+
+        loaded = main.AddressBook()
+        self.assertEqual(self.journal.replay(loaded), 1)
+        self.assertEqual(list(loaded.data), ['A'])
+
+    def test_replay_stops_at_malformed_record(self):
+        bad_entries = [
+            ['not', 'a', 'tuple'],
+            (2, 'add_phone'),
+            ('2', 'add_phone', ('B', '0000000002')),
+            (2, ['add_phone'], ('B', '0000000002')),
+            (2, 'add_phone', ['B', '0000000002']),
+            (2, 'add_phone', ('B',)),
+            (2, 'edit_phone', ('A', '0000000001')),
+            (2, 'add_phone', ('B', 2)),
+        ]
+        for bad in bad_entries:
+            with self.subTest(bad=bad):
+                self.journal.clear()
+                book = main.AddressBook()
+                main.add_contact(['A', '0000000001'], book)
+                buf = pickle.dumps(bad)
+                with open(self.journal.filename, 'ab') as f:
+                    f.write(main.struct.pack(">I", len(buf)) + buf)
+                main.add_contact(['B', '0000000002'], book)
+
+                loaded = main.AddressBook()
+                self.assertEqual(self.journal.replay(loaded), 1)
+                self.assertEqual(list(loaded.data), ['A'])
+
+    def test_replay_survives_random_corruption(self):
+        book = main.AddressBook()
+        main.add_contact(['A', '0000000001'], book)
+        main.change_contact(['A', '0000000001', '0000000002'], book)
+        main.add_birthday(['A', '14.03.1990'], book)
+        with open(self.journal.filename, 'rb') as f:
+            original = f.read()
+        rng = random.Random(0)
+        for _ in range(500):
+            data = bytearray(original)
+            for _ in range(rng.randint(1, 4)):
+                data[rng.randrange(len(data))] = rng.randrange(256)
+            with open(self.journal.filename, 'wb') as f:
+                f.write(data)
+            loaded = main.AddressBook()
+            self.assertLessEqual(self.journal.replay(loaded), 3)
+
+    def test_replay_stops_at_unknown_operation(self):
+        book = main.AddressBook()
+        main.add_contact(['A', '0000000001'], book)
+        self.journal.append(book, 'rename', ('A', 'Z'))
+        main.add_contact(['B', '0000000002'], book)
+
+        loaded = main.AddressBook()
+        self.assertEqual(self.journal.replay(loaded), 1)
+        self.assertEqual(list(loaded.data), ['A'])
+
+    def test_replay_stops_at_gap_after_backup_fallback(self):
+        book = main.AddressBook()
+        main.add_contact(['A', '0000000001'], book)
+        main.save_data(book, self.snapshot)
+        self.journal.clear()
+        main.add_contact(['B', '0000000002'], book)
+        main.save_data(book, self.snapshot)
+        self.journal.clear()
+        main.change_contact(['B', '0000000002', '0000000003'], book)
+        with open(self.snapshot, 'r+b') as f:
+            f.truncate(os.path.getsize(self.snapshot) // 2)
+
+        loaded = main.load_data(self.snapshot)
+        self.assertEqual(list(loaded.data), ['A'])
+        self.assertEqual(self.journal.replay(loaded), 0)
+        self.assertEqual(list(loaded.data), ['A'])
+        self.assertEqual(loaded._journal_seq, 1)
+
+    def test_replay_stops_when_an_operation_fails(self):
+        book = main.AddressBook()
+        main.add_contact(['A', '0000000001'], book)
+        self.journal.append(book, 'edit_phone', ('A', '0000000009', '0000000002'))
+        main.add_contact(['B', '0000000002'], book)
+
+        loaded = main.AddressBook()
+        self.assertEqual(self.journal.replay(loaded), 1)
+        self.assertEqual(list(loaded.data), ['A'])
+
+    def test_invalid_phone_creates_no_contact(self):
+        book = main.AddressBook()
+        self.assertEqual(main.add_contact(['A', '123'], book)[0], 'ERROR')
+        self.assertIsNone(book.find('A'))
+        self.assertEqual(main.add_birthday(['A', '14.03.1990'], book)[0], 'ERROR')
+        self.assertEqual(self.journal.replay(main.AddressBook()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()